@@ -2,6 +2,8 @@ import random
 
 from mesa import Agent
 
+from directions import EAST, WEST, NORTH, SOUTH, OFFSETS
+
 
 class Car(Agent):
     """The car class manages all the decision made by the individual cars.
@@ -18,6 +20,8 @@ class Car(Agent):
 
     def remove_agent(self):
         """Remove agent from the grid if it reached the end"""
+        self.model.car_occupancy[self.pos] -= 1
+        self.model.cars_by_dir[self.direction] -= 1
         self.model.schedule.remove(self)
         self.model.grid.remove_agent(self)
 
@@ -34,112 +38,89 @@ class Car(Agent):
 
     def move_forward(self, x, y):
         """Move agent 1 cell forward and increase travelled distance by one"""
-        self.model.grid.move_agent(self, (self.pos[0] + x, self.pos[1] + y))
+        new_pos = (self.pos[0] + x, self.pos[1] + y)
+        self.model.car_occupancy[self.pos] -= 1
+        self.model.car_occupancy[new_pos] += 1
+        self.model.grid.move_agent(self, new_pos)
         self.distance += 1
+        if new_pos in self.model.exit_cells:
+            self.model.register_exit(self)
 
     def move(self):
         """ Main move loop, determines if and where the car moves """
-        if self.direction == 'east':
+        if self.direction == EAST:
             if self.can_move(self.model.grid.width - 1, 0):
                 if self.turn_ahead():            # if car has to turn
                     if self.distance < self.model.grid.width / 2:
                         # car has to turn right
-                        self.turn('south', 0, -1)
+                        self.turn(SOUTH, 0, -1)
                     else:
                         # car has to turn left
-                        self.turn('north', 0, 1)
+                        self.turn(NORTH, 0, 1)
                 else:
                     self.move_forward(1, 0)
             else:
                 self.wait_time += 1
 
         # all the other 3 parts work the same, just with different variables
-        elif self.direction == 'west':
+        elif self.direction == WEST:
             if self.can_move(0, 0):
                 if self.turn_ahead():
                     if self.distance < self.model.grid.width / 2:
-                        self.turn('north', 0, 1)
+                        self.turn(NORTH, 0, 1)
                     else:
-                        self.turn('south', 0, -1)
+                        self.turn(SOUTH, 0, -1)
                 else:
                     self.move_forward(-1, 0)
             else:
                 self.wait_time += 1
 
-        elif self.direction == 'north':
+        elif self.direction == NORTH:
             if self.can_move(self.model.grid.width - 1, 1):
                 if self.turn_ahead():
                     if self.distance < self.model.grid.width / 2:
-                        self.turn('east', 1, 0)
+                        self.turn(EAST, 1, 0)
                     else:
-                        self.turn('west', -1, 0)
+                        self.turn(WEST, -1, 0)
                 else:
                     self.move_forward(0, 1)
             else:
                 self.wait_time += 1
 
-        elif self.direction == 'south':
+        elif self.direction == SOUTH:
             if self.can_move(0, 1):
                 if self.turn_ahead():
                     if self.distance < self.model.grid.width / 2:
-                        self.turn('west', -1, 0)
+                        self.turn(WEST, -1, 0)
                     else:
-                        self.turn('east', 1, 0)
+                        self.turn(EAST, 1, 0)
                 else:
                     self.move_forward(0, -1)
             else:
                 self.wait_time += 1
 
     def get_traffic_light(self):
-        """Get the correct traffic light"""
-        for light in self.model.traffic_lights:  # loop over all lights
-            # if light has same direction as car
-            if light.direction == self.direction:
-                if self.direction == 'east' or self.direction == 'west':
-                    # light has to be in same lane as car
-                    if light.pos[1] == self.pos[1]:
-                        return light
-                if self.direction == 'north' or self.direction == 'south':
-                    # light has to be in same lane as car
-                    if light.pos[0] == self.pos[0]:
-                        return light
-
-    def look_ahead(self):
-        """Look at the contents of the cell 1 position ahead"""
-        if(self.direction == 'east'):
-            cellContents = list(
-                self.model.grid.iter_cell_list_contents(
-                    (self.pos[0] + 1, self.pos[1])))
-        elif(self.direction == 'west'):
-            cellContents = list(
-                self.model.grid.iter_cell_list_contents(
-                    (self.pos[0] - 1, self.pos[1])))
-        elif(self.direction == 'south'):
-            cellContents = list(
-                self.model.grid.iter_cell_list_contents(
-                    (self.pos[0], self.pos[1] - 1)))
-        elif(self.direction == 'north'):
-            cellContents = list(
-                self.model.grid.iter_cell_list_contents(
-                    (self.pos[0], self.pos[1] + 1)))
-        return cellContents
+        """Get the correct traffic light, the light with the same direction
+        as the car in the same lane"""
+        if self.direction in (EAST, WEST):
+            lane = self.pos[1]
+        else:
+            lane = self.pos[0]
+        return self.model.lights_by_lane.get((self.direction, lane))
+
+    def cell_ahead(self):
+        """Get the position of the cell 1 position ahead"""
+        x, y = OFFSETS[self.direction]
+        return (self.pos[0] + x, self.pos[1] + y)
 
     def turn_ahead(self):
         """Check whether the car has to make a turn"""
-        cellAhead = self.look_ahead()
-        for agent in cellAhead:
-            # if next cell is a barrier
-            if(agent.type == 'background' and agent.color == 'darkslategrey'):
-                return True              # car has to make a turn
-        return False               # car does not have to make a turn
+        # if next cell is a barrier the car has to make a turn
+        return self.model.bg_color[self.cell_ahead()] == 'darkslategrey'
 
     def car_ahead(self):
         """Check whether there is a car in the cell ahead"""
-        cellAhead = self.look_ahead()   # get content from cell ahead
-        for agent in cellAhead:
-            if(agent.type == 'car'):
-                return True                  # there is a car ahead
-        return False                   # there is no car ahead
+        return bool(self.model.car_occupancy[self.cell_ahead()])
 
     def step(self):
         """Called every step for every individual car"""
@@ -147,7 +128,9 @@ class Car(Agent):
 
     def turn(self, direction, x, y):
         """General turn function"""
+        self.model.cars_by_dir[self.direction] -= 1
         self.direction = direction    # change direction the car is moving in
+        self.model.cars_by_dir[self.direction] += 1
         # move one cell forward in new direction
         self.move_forward(x, y)
 
@@ -1,22 +1,31 @@
 from mesa import Agent
 
+from directions import EAST
+
 
 class Controller(Agent):
     """The controller of the demand based system"""
 
+    __slots__ = ('type', 'green_lights', 'time', 'delay_limit',
+                 'lights_by_dir')
+
     def __init__(self, id, model):
         super().__init__(id, model)     # required, part of mesa
         self.type = 'controller'
-        self.green_lights = 'east'
+        self.green_lights = EAST
         self.time = 0
         self.delay_limit = 60   # max amount of time a car should have to wait
+        # group the lights by direction once, the lights are already placed
+        self.lights_by_dir = [[], [], [], []]
+        for light in model.traffic_lights:
+            self.lights_by_dir[light.direction].append(light)
 
     def determine_light(self):
         """Determine which combination of lights has the highest demand.
         The time variable assures 7 second interval between two green lights"""
         self.time += 1
         demands = self.combine_demands()
-        highest_demand = max(demands, key=demands.get)
+        highest_demand = demands.index(max(demands))
         self.check_delay_limit()
         if not self.car_waiting_long():
             if demands[self.green_lights] < demands[highest_demand] - 6:
@@ -25,43 +34,39 @@ class Controller(Agent):
                     self.time = 0
 
     def car_waiting(self):
-        """Check whether there is a car waitin for the traffic light"""
-        for light in self.model.traffic_lights:
-            if light.get_direction() == self.green_lights:
-                if not light.get_car_waiting():
-                    return False
-        return True
+        """Check whether there is a car waiting at every light of the
+        current green direction, in which case the lights stay green"""
+        return all(light.car_waiting
+                   for light in self.lights_by_dir[self.green_lights])
 
     def check_delay_limit(self):
         """Lower the delay limit back to 60 if possible, this is done
         to avoid the delay limit from increasing to much"""
         if self.delay_limit > 60:
-            for light in self.model.traffic_lights:
-                if light.get_waiting_time() > self.delay_limit - 16:
-                    return
-            self.delay_limit -= 16
+            if not any(light.waiting_time > self.delay_limit - 16
+                       for light in self.model.traffic_lights):
+                self.delay_limit -= 16
 
     def car_waiting_long(self):
         """Check if there is a car waiting longer than the delay limit.
         If so, that car's light is prioritized and the delay limit
         is increased, to avoid switching after one second if multiple cars
         have reached the delay limit simultaneously."""
-        for light in self.model.traffic_lights:
-            if light.get_waiting_time() > self.delay_limit:
-                self.green_lights = light.get_direction()
-                if self.time > 8:
-                    self.time = 0
-                    self.delay_limit += 16
-                return True
-        return False
+        light = next((light for light in self.model.traffic_lights
+                      if light.waiting_time > self.delay_limit), None)
+        if light is None:
+            return False
+        self.green_lights = light.direction
+        if self.time > 8:
+            self.time = 0
+            self.delay_limit += 16
+        return True
 
     def combine_demands(self):
         """Combine the demands of the individual lights
         in the different groups of lights"""
-        demands = {'east': 0, 'west': 0, 'north': 0, 'south': 0}
-        for light in self.model.traffic_lights:
-            demands[light.get_direction()] += light.get_demand()
-        return demands
+        return [sum(light.demand for light in lights)
+                for lights in self.lights_by_dir]
 
     def get_type(self):
         """Get the type of the agent"""
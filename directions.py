@@ -0,0 +1,8 @@
+"""The four directions in which traffic can travel. They are stored as
+small integers so they are cheap to compare and can be used as indices,
+e.g. in the flows of the grid and the demands of the controller."""
+
+EAST, WEST, NORTH, SOUTH = 0, 1, 2, 3
+
+# (x, y) offset of one cell forward in every direction
+OFFSETS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
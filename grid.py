@@ -1,13 +1,14 @@
-import random
+import itertools
 
+import numpy as np
 from mesa import Model
 from mesa.space import MultiGrid
 from mesa.time import BaseScheduler
 from mesa.datacollection import DataCollector
 
-from background import Background
 from car import Car
 from controller import Controller
+from directions import EAST, WEST, NORTH, SOUTH
 from trafficlight import Traffic_light
 
 
@@ -20,7 +21,15 @@ class Grid(Model):
     the fixed time, flow based, or demand based system is used.
     """
 
-    def __init__(self, east_flow, west_flow, north_flow, south_flow, system):
+    # (direction, x, y) of the cells where cars are added
+    SPAWN_POINTS = (
+        (EAST, 0, 9), (EAST, 0, 10), (EAST, 0, 11),
+        (WEST, 24, 13), (WEST, 24, 14), (WEST, 24, 15),
+        (NORTH, 13, 0), (NORTH, 14, 0), (NORTH, 15, 0),
+        (SOUTH, 9, 24), (SOUTH, 10, 24), (SOUTH, 11, 24))
+
+    def __init__(self, east_flow, west_flow, north_flow, south_flow, system,
+                 verbose=False, collect_every=1):
         """The Grid class deals with the actual model of the whole simulation
         and add all the agents to the grid and initializes the model.
 
@@ -29,130 +38,119 @@ class Grid(Model):
 
         Four flow parameters are passed to initalize the model. These represent
         flow of the cars from the 4 different directions in the simulation.
+        If verbose is set, the car count and average wait time are printed
+        every step. The data for the charts is collected every collect_every
+        steps; the charts in main.py read it every step, so only headless
+        runs should set it higher than 1.
         """
         self.grid = MultiGrid(25, 25, False)
+        # number of cars in every cell, kept up to date by the cars
+        self.car_occupancy = np.zeros((25, 25), dtype=np.uint8)
+        # number of cars travelling in every direction
+        self.cars_by_dir = [0, 0, 0, 0]
         self.schedule = BaseScheduler(self)
         self.running = True
-        self.id = 0
+        self.ids = itertools.count()     # unique ids of the agents
         self.traffic_lights = []
+        # lights indexed by (direction, lane), lane is the y coordinate for
+        # east and west and the x coordinate for north and south
+        self.lights_by_lane = {}
+        self.controller = None
+        # the flows are indexed by direction
         self.flows = [east_flow, west_flow, north_flow, south_flow]
+        self.timer_schedule = self.calculate_timer()
+        # cells where cars leave the grid after crossing the intersection
+        self.exit_cells = {(0, 14), (10, 0), (24, 10), (14, 24)}
         self.car_counter = 0
-        self.wait_times = []
+        self.total_wait_time = 0
         self.average_wait_time = 0
         self.dctt = DataCollector(model_reporters={
             "Avg wait time": lambda model: model.average_wait_time})
         self.dccc = DataCollector(model_reporters={
             "Car count": lambda model: model.car_counter})
         self.system = system
+        self.verbose = verbose
+        self.collect_every = collect_every
+        self.rng = np.random.default_rng()
 
         # Add all the different agents to the blocks in the model
-        self.add_roads()
-        self.add_barriers()
-        self.finish_background()
+        self.add_background()
         self.add_traffic_lights()
         self.add_controller()
 
+    def register_exit(self, car):
+        """Register a car that has reached one of the exit cells, so its
+        wait time is taken into account in the statistics.
+        """
+        self.car_counter += 1
+        self.total_wait_time += car.wait_time
+
     def count_cars(self):
         """ Function to count the number of cars that have cleared the model.
         They are counted when they have successfully crossed the intersection
-        and left the screen.
+        and reached one of the exit cells.
         """
-        self.car_counter += \
-            len(self.grid.get_cell_list_contents((0, 14))) + \
-            len(self.grid.get_cell_list_contents((10, 0))) + \
-            len(self.grid.get_cell_list_contents((24, 10))) + \
-            len(self.grid.get_cell_list_contents((14, 24))) - 4
-
-        print("COUNT", self.car_counter)
+        if self.verbose:
+            print("COUNT", self.car_counter)
         return self.car_counter
 
     def calculate_average_wait_time(self):
-        """Calculate the average waiting time of all the cars that are
-        currently and were previously on the grid
+        """Calculate the average waiting time of all the cars that have
+        crossed the intersection
         """
-        all_agents = []
-        all_agents += self.grid.get_cell_list_contents((0, 14))
-        all_agents += self.grid.get_cell_list_contents((10, 0))
-        all_agents += self.grid.get_cell_list_contents((24, 10))
-        all_agents += self.grid.get_cell_list_contents((14, 24))
-        for agent in all_agents:
-            if (agent.type == "car"):
-                self.wait_times.append(agent.wait_time)
-        if len(self.wait_times) != 0:
-            self.average_wait_time = sum(self.wait_times)/len(self.wait_times)
-            print("Average travel time of cars is:", self.average_wait_time)
+        if self.car_counter != 0:
+            self.average_wait_time = self.total_wait_time / self.car_counter
+            if self.verbose:
+                print("Average travel time of cars is:",
+                      self.average_wait_time)
         else:
-            print("No cars have passed yet")
+            if self.verbose:
+                print("No cars have passed yet")
             return 0
 
+    def next_id(self):
+        """Return a new unique id for an agent"""
+        return next(self.ids)
+
     def add_controller(self):
         """Add the controller of the demand based system to the grid"""
-        controller = Controller(self.id, self)
+        controller = Controller(self.next_id(), self)
+        self.controller = controller
         self.schedule.add(controller)
         self.grid.place_agent(controller, (0, 0))   # makes it easier to find
-        self.id += 1
 
-    def add_background_agent(self, color, x, y):
-        """Function that given a color and a position (x, y) fills
-        that position with the background color.
-        """
-        self.grid.place_agent(Background(self.id, self, color), (x, y))
-        self.id += 1
+    def add_background(self):
+        """Function that sets the background colors of the simulation: the
+        roads (grey) and the barriers between the lanes (darkslategrey) on
+        top of a green background.
 
-    def add_road(self, direction, position, begin, end):
-        """Function that places a background agent with the color gray to
-        mimic a road. This take direction as a prameter to determine which
-        direction the road takes.
+        The colors are stored in bg_color rather than as agents in the grid,
+        as they never act and are only read when drawing the canvas and when
+        cars check for a barrier ahead.
         """
-        for i in range(begin, end):
-            if direction == 'east':
-                if self.grid.is_cell_empty([i, position]):
-                    self.add_background_agent('grey', i, position)
-            if direction == 'north':
-                if self.grid.is_cell_empty([position, i]):
-                    self.add_background_agent('grey', position, i)
-
-    def add_roads(self):
-        """Function that adds all the different roads to the simualation"""
-        self.add_road('east', 9, 0, 10)
-        self.add_road('east', 10, 0, self.grid.width)
-        self.add_road('east', 11, 0, 15)
-
-        self.add_road('east', 13, 10, self.grid.width)
-        self.add_road('east', 14, 0, self.grid.width)
-        self.add_road('east', 15, 15, self.grid.width)
-
-        self.add_road('north', 13, 0, 15)
-        self.add_road('north', 14, 0, self.grid.height)
-        self.add_road('north', 15, 0, 10)
-
-        self.add_road('north', 9, 15, self.grid.height)
-        self.add_road('north', 10, 0, self.grid.height)
-        self.add_road('north', 11, 10, self.grid.height)
-
-    def add_barrier(self, direction, position, length):
-        """Add a single barrier to the grid"""
-        for i in range(0, length):
-            if direction == 'east':
-                if self.grid.is_cell_empty([i, position]):
-                    self.add_background_agent('darkslategrey', i, position)
-            if direction == 'north':
-                if self.grid.is_cell_empty([position, i]):
-                    self.add_background_agent('darkslategrey', position, i)
-
-    def add_barriers(self):
-        """Calls add_barrier() to add all the barriers to the grid"""
-        self.add_barrier('east', 11, self.grid.width)
-        self.add_barrier('east', 12, self.grid.width)
-        self.add_barrier('east', 13, self.grid.width)
-
-        self.add_barrier('north', 11, self.grid.height)
-        self.add_barrier('north', 12, self.grid.height)
-        self.add_barrier('north', 13, self.grid.height)
-
-    def finish_background(self):
-        """ Adds a large background agent with the same size of the grid """
-        self.add_background_agent('green', 12, 12)
+        colors = np.full((self.grid.width, self.grid.height), 'green',
+                         dtype=object)
+        colors[:, 11:14] = 'darkslategrey'
+        colors[11:14, :] = 'darkslategrey'
+
+        # roads in east-west direction, these are placed over the barriers
+        colors[0:10, 9] = 'grey'
+        colors[:, 10] = 'grey'
+        colors[0:15, 11] = 'grey'
+
+        colors[10:, 13] = 'grey'
+        colors[:, 14] = 'grey'
+        colors[15:, 15] = 'grey'
+
+        # roads in north-south direction
+        colors[13, 0:15] = 'grey'
+        colors[14, :] = 'grey'
+        colors[15, 0:10] = 'grey'
+
+        colors[9, 15:] = 'grey'
+        colors[10, :] = 'grey'
+        colors[11, 10:] = 'grey'
+        self.bg_color = colors
 
     def add_traffic_light(self, x, y, direction, turn=''):
         """Adds a traffic light to the grid and the scheduler.
@@ -160,46 +158,52 @@ class Grid(Model):
         (x, y) are the coordinates of the light and direction is the direction
         of flow that the traffic light controls.
         """
-        traffic_light = Traffic_light(self.id, self, direction, turn)
+        traffic_light = Traffic_light(self.next_id(), self, direction, turn)
         self.grid.place_agent(traffic_light, (x, y))
+        traffic_light.set_lookahead()
         self.schedule.add(traffic_light)
-        self.id += 1
         self.traffic_lights.append(traffic_light)
+        if direction in (EAST, WEST):
+            self.lights_by_lane[(direction, y)] = traffic_light
+        else:
+            self.lights_by_lane[(direction, x)] = traffic_light
 
     def add_traffic_lights(self):
         """Add all the traffic lights to the grid"""
-        self.add_traffic_light(9, 9, 'east', 'right')
-        self.add_traffic_light(9, 10, 'east')
-        self.add_traffic_light(9, 11, 'east', 'left')
+        self.add_traffic_light(9, 9, EAST, 'right')
+        self.add_traffic_light(9, 10, EAST)
+        self.add_traffic_light(9, 11, EAST, 'left')
 
-        self.add_traffic_light(15, 13, 'west', 'left')
-        self.add_traffic_light(15, 14, 'west')
-        self.add_traffic_light(15, 15, 'west', 'right')
+        self.add_traffic_light(15, 13, WEST, 'left')
+        self.add_traffic_light(15, 14, WEST)
+        self.add_traffic_light(15, 15, WEST, 'right')
 
-        self.add_traffic_light(13, 9, 'north', 'left')
-        self.add_traffic_light(14, 9, 'north')
-        self.add_traffic_light(15, 9, 'north', 'right')
+        self.add_traffic_light(13, 9, NORTH, 'left')
+        self.add_traffic_light(14, 9, NORTH)
+        self.add_traffic_light(15, 9, NORTH, 'right')
 
-        self.add_traffic_light(9, 15, 'south', 'right')
-        self.add_traffic_light(10, 15, 'south')
-        self.add_traffic_light(11, 15, 'south', 'left')
+        self.add_traffic_light(9, 15, SOUTH, 'right')
+        self.add_traffic_light(10, 15, SOUTH)
+        self.add_traffic_light(11, 15, SOUTH, 'left')
 
-    def add_car(self, direction, x, y, flow):
+    def add_car(self, direction, x, y, flow, rand):
         """Function to add a car to grid at position (x, y) going in the
         given direction.
 
-        The chance a car is added is based on the value of the flow.
+        The chance a car is added is based on the value of the flow, rand is
+        a random number between 1 and 100 drawn for this attempt.
         """
-        rand = random.randint(1, 100)
-        if flow > rand:
-            cell = list(self.grid.iter_cell_list_contents((x, y)))
-            for agent in cell:
-                if (agent.type == 'car'):
-                    return
-            car = Car(self.id, self, direction)     # create new car
-            self.grid.place_agent(car, (x, y))
-            self.schedule.add(car)
-            self.id += 1
+        if flow <= 0:
+            return
+        if rand >= flow:
+            return
+        if self.car_occupancy[x, y]:    # there is already a car
+            return
+        car = Car(self.next_id(), self, direction)     # create new car
+        self.grid.place_agent(car, (x, y))
+        self.car_occupancy[x, y] += 1
+        self.cars_by_dir[direction] += 1
+        self.schedule.add(car)
 
     def calculate_on_time(self, flow):
         """Function that given the value of the flow in a certain direction,
@@ -237,31 +241,30 @@ class Grid(Model):
 
         return [first, second, third, fourth, fifth, sixth, seventh, eighth]
 
+    def set_flows(self, east_flow, west_flow, north_flow, south_flow):
+        """Change the flows of the cars from the 4 different directions and
+        update the times of the flow based timer of all the lights.
+        """
+        self.flows = [east_flow, west_flow, north_flow, south_flow]
+        self.timer_schedule = self.calculate_timer()
+        for light in self.traffic_lights:
+            light.set_flow_schedule(self.timer_schedule)
+
     def step(self):
         """Step function that is automatically called at each time step of
         the model.
 
         Attempt to add cars in all directions based on the flow value.
         Also count the amount of cars passed and update the average
-        wait time and the car count
+        wait time and the car count, which are collected for the charts
+        every collect_every steps.
         """
         self.schedule.step()
-        self.add_car('east', 0, 9, self.flows[0])
-        self.add_car('east', 0, 10, self.flows[0])
-        self.add_car('east', 0, 11, self.flows[0])
-
-        self.add_car('west', 24, 13, self.flows[1])
-        self.add_car('west', 24, 14, self.flows[1])
-        self.add_car('west', 24, 15, self.flows[1])
-
-        self.add_car('north', 13, 0, self.flows[2])
-        self.add_car('north', 14, 0, self.flows[2])
-        self.add_car('north', 15, 0, self.flows[2])
-
-        self.add_car('south', 9, 24, self.flows[3])
-        self.add_car('south', 10, 24, self.flows[3])
-        self.add_car('south', 11, 24, self.flows[3])
+        rands = self.rng.integers(1, 101, size=len(self.SPAWN_POINTS))
+        for i, (direction, x, y) in enumerate(self.SPAWN_POINTS):
+            self.add_car(direction, x, y, self.flows[direction], rands[i])
         self.count_cars()
         self.calculate_average_wait_time()
-        self.dctt.collect(self)
-        self.dccc.collect(self)
+        if self.schedule.steps % self.collect_every == 0:
+            self.dctt.collect(self)
+            self.dccc.collect(self)
@@ -1,7 +1,9 @@
+import numpy as np
 from mesa.visualization.modules import ChartModule, CanvasGrid
 from mesa.visualization.UserParam import UserSettableParameter
 from mesa.visualization.ModularVisualization import ModularServer
 
+from directions import EAST, WEST, NORTH, SOUTH
 from grid import Grid
 
 """ Main loop of the program. The code is related to the canvas, so the
@@ -10,26 +12,26 @@ way the grid is displayed. Also, it sets and launches the local server"""
 
 def setArrowDirection(agent, portrayal):
     """Set direction in which the car(arrow) points"""
-    if agent.get_direction() == 'north':
+    if agent.get_direction() == NORTH:
         portrayal['heading_x'] = 0
         portrayal['heading_y'] = 1
-    if agent.get_direction() == 'south':
+    if agent.get_direction() == SOUTH:
         portrayal['heading_x'] = 0
         portrayal['heading_y'] = -1
-    if agent.get_direction() == 'west':
+    if agent.get_direction() == WEST:
         portrayal['heading_x'] = -1
         portrayal['heading_y'] = 0
-    if agent.get_direction() == 'east':
+    if agent.get_direction() == EAST:
         portrayal['heading_x'] = 1
         portrayal['heading_y'] = 0
 
 
 def setRectDirection(agent, portrayal):
     """Set direction of the traffic light"""
-    if agent.get_direction() == 'south' or agent.get_direction() == 'north':
+    if agent.get_direction() in (SOUTH, NORTH):
         portrayal['w'] = 0.8
         portrayal['h'] = 0.1
-    if agent.get_direction() == 'east' or agent.get_direction() == 'west':
+    if agent.get_direction() in (EAST, WEST):
         portrayal['w'] = 0.1
         portrayal['h'] = 0.8
 
@@ -56,23 +58,45 @@ def agent_portrayal(agent):
         setRectDirection(agent, portrayal)
         return portrayal
 
-    if agent.get_type() == 'background':
-        if agent.get_color() == 'green':
-            portrayal = {'Shape': 'rect',
-                         'Color': agent.get_color(), 'Filled': 'true',
-                         'Layer': 0,   # lowest layer, so only background
-                         'w': 25,
-                         'h': 25
-                         }
-            return portrayal
+
+def background_portrayal(color):
+    """Portrayal of a background color on the canvas"""
+    if color == 'green':
         portrayal = {'Shape': 'rect',
-                     'Color': agent.get_color(),
-                     'Filled': 'true',
-                     'Layer': 1,
-                     'w': 1,
-                     'h': 1
+                     'Color': color, 'Filled': 'true',
+                     'Layer': 0,   # lowest layer, so only background
+                     'w': 25,
+                     'h': 25
                      }
         return portrayal
+    portrayal = {'Shape': 'rect',
+                 'Color': color,
+                 'Filled': 'true',
+                 'Layer': 1,
+                 'w': 1,
+                 'h': 1
+                 }
+    return portrayal
+
+
+class BackgroundCanvasGrid(CanvasGrid):
+    """Canvas that also draws the background colors of the model, which are
+    not agents in the grid but stored in model.bg_color"""
+
+    def render(self, model):
+        grid_state = super().render(model)
+        # a single green rect in the middle covers the whole grid
+        portrayal = background_portrayal('green')
+        portrayal['x'] = 12
+        portrayal['y'] = 12
+        grid_state[portrayal['Layer']].append(portrayal)
+        for x, y in np.ndindex(model.bg_color.shape):
+            if model.bg_color[x, y] != 'green':
+                portrayal = background_portrayal(model.bg_color[x, y])
+                portrayal['x'] = x
+                portrayal['y'] = y
+                grid_state[portrayal['Layer']].append(portrayal)
+        return grid_state
 
 
 # sliders that give the possibility to change the traffic flow
@@ -89,7 +113,7 @@ south_flow = UserSettableParameter(
     'slider', "% traffic flow from South", 15, 1, 100, 5)
 
 # how the canvas looks
-canvas = CanvasGrid(agent_portrayal, 25, 25, 750, 750)
+canvas = BackgroundCanvasGrid(agent_portrayal, 25, 25, 750, 750)
 chartTT = ChartModule([{"Label": "Avg wait time", "Color": "Black"}],
                       data_collector_name='dctt')
 chartCC = ChartModule([{"Label": "Car count", "Color": "Blue"}],
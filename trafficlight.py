@@ -1,5 +1,36 @@
+import numpy as np
 from mesa import Agent
 
+from directions import EAST, WEST, NORTH, SOUTH, OFFSETS
+
+try:
+    import numba
+except ImportError:     # numba is optional, see calculate_demand()
+    numba = None
+
+
+def compute_demand(occupancy, x, y, dx, dy):
+    """Return the amount of cells with a car in the 10 cells in front of the
+    light at (x, y). Only used when numba is installed, which compiles it.
+
+    (dx, dy) is one cell forward in the direction of the light, so the cells
+    in front of the light are found by stepping back from it.
+    """
+    demand = 0
+    for i in range(10):
+        cx = x - i * dx
+        cy = y - i * dy
+        if (cx < 0 or cy < 0 or cx >= occupancy.shape[0]
+                or cy >= occupancy.shape[1]):
+            break
+        if occupancy[cx, cy]:
+            demand += 1
+    return demand
+
+
+if numba is not None:
+    compute_demand = numba.njit(cache=True)(compute_demand)
+
 
 class Traffic_light(Agent):
     """Class that is responsible for the functionality of the traffic
@@ -14,6 +45,16 @@ class Traffic_light(Agent):
     change color.
     """
 
+    __slots__ = ('type', 'color', 'time', 'direction', 'turn', 'demand',
+                 'waiting_time', 'car_waiting', 'lookahead', 'fixed_schedule',
+                 'flow_schedule', 'flow_cycle')
+
+    # (time, direction, color) changes of the fixed timer
+    FIXED_EVENTS = [(5, NORTH, 'red'), (8, EAST, 'green'),
+                    (13, EAST, 'red'), (16, SOUTH, 'green'),
+                    (21, SOUTH, 'red'), (24, WEST, 'green'),
+                    (29, WEST, 'red'), (32, NORTH, 'green')]
+
     def __init__(self, id, model, direction, turn='no turn'):
         super().__init__(id, model)
         self.type = 'light'
@@ -24,127 +65,110 @@ class Traffic_light(Agent):
         self.demand = 0
         self.waiting_time = 0
         self.car_waiting = False
+        self.lookahead = None
+        self.fixed_schedule = self.build_schedule(self.FIXED_EVENTS)
+        self.set_flow_schedule(model.timer_schedule)
+
+    def build_schedule(self, events):
+        """Return the color changes out of events, given as
+        (time, direction, color), that concern this light, indexed by the
+        time at which they happen."""
+        return {time: color for time, direction, color in events
+                if direction == self.direction}
+
+    def set_flow_schedule(self, times):
+        """Store the color changes of the flow based timer, based on the
+        times calculated once by calculate_timer() in grid.py"""
+        directions = [EAST, EAST, WEST, WEST, NORTH, NORTH, SOUTH, SOUTH]
+        colors = ['green', 'red'] * 4
+        self.flow_schedule = self.build_schedule(
+            zip(times, directions, colors))
+        self.flow_cycle = times[7]
+
+    def run_schedule(self, schedule, cycle):
+        """Apply the color change scheduled for the current time, if any.
+
+        The time variable is incremented and reset once it reaches the end
+        of the cycle so this runs in a loop fashion.
+        """
+        color = schedule.get(self.time)
+        if color:
+            self.set_color(color)
+        if self.time >= cycle:     # cycle may have shrunk after set_flows
+            self.time = 0
+        self.time += 1
 
     def fixed_timer(self):
         """Fixed timer that changes light in a brute force way, where
         the times are already predetermined. The first naive approach
         to the traffic light logic.
 
-        The time variable is incremented and reset once it reaches 32 so
-        this runs in a loop fashion.
+        The cycle restarts once the time reaches 32.
         """
-        if self.time == 5:
-            if self.direction == 'north':
-                self.set_color('red')
-        if self.time == 8:
-            if self.direction == 'east':
-                self.set_color('green')
-        if self.time == 13:
-            if self.direction == 'east':
-                self.set_color('red')
-        if self.time == 16:
-            if self.direction == 'south':
-                self.set_color('green')
-        if self.time == 21:
-            if self.direction == 'south':
-                self.set_color('red')
-        if self.time == 24:
-            if self.direction == 'west':
-                self.set_color('green')
-        if self.time == 29:
-            if self.direction == 'west':
-                self.set_color('red')
-        if self.time == 32:
-            if self.direction == 'north':
-                self.set_color('green')
-            self.time = 0
-        self.time += 1
+        self.run_schedule(self.fixed_schedule, 32)
 
-    def flow_based_timer(self, times):
+    def flow_based_timer(self):
         """Timer that is semi-brute force.
 
-        This timer when called with the calculate_timer() in the grid.py
-        sets the correct intervals based on the flows of the traffic from
-        the different directions. Very similar to timer1() but times are
+        The color changes are set by set_flow_schedule() with the correct
+        intervals based on the flows of the traffic from the different
+        directions. Very similar to fixed_timer() but times are
         pre-calculated.
         """
-        if self.time == times[0]:
-            if self.direction == 'east':
-                self.set_color('green')
-        if self.time == times[1]:
-            if self.direction == 'east':
-                self.set_color('red')
-        if self.time == times[2]:
-            if self.direction == 'west':
-                self.set_color('green')
-        if self.time == times[3]:
-            if self.direction == 'west':
-                self.set_color('red')
-        if self.time == times[4]:
-            if self.direction == 'north':
-                self.set_color('green')
-        if self.time == times[5]:
-            if self.direction == 'north':
-                self.set_color('red')
-        if self.time == times[6]:
-            if self.direction == 'south':
-                self.set_color('green')
-        if self.time == times[7]:
-            if self.direction == 'south':
-                self.set_color('red')
-            self.time = 0
-        self.time += 1
+        self.run_schedule(self.flow_schedule, self.flow_cycle)
 
     def demand_based_timer(self):
         """Third timer, based on demand of the lanes
 
         Checks with the controller whether the light should be green or red.
         The 7 second pause assurres there are no collisions between cars"""
-        cell = list(self.model.grid.iter_cell_list_contents((0, 0)))
-        for agent in cell:
-            if (agent.type == 'controller'):
-                controller = agent
+        controller = self.model.controller
         if self.direction == controller.green_lights and controller.time > 7:
             self.set_color('green')
             self.waiting_time = 0
         else:
             self.set_color('red')
 
+    def set_lookahead(self):
+        """Determine the 10 cells in front of the light that are used to
+        calculate the demand. Has to be called once the light is placed."""
+        x, y = self.pos
+        if self.direction == EAST:
+            self.lookahead = (slice(max(x - 9, 0), x + 1), y)
+        if self.direction == WEST:
+            self.lookahead = (slice(x, x + 10), y)
+        if self.direction == SOUTH:
+            self.lookahead = (x, slice(y, y + 10))
+        if self.direction == NORTH:
+            self.lookahead = (x, slice(max(y - 9, 0), y + 1))
+
     def calculate_demand(self):
         """Calculate the demand of the traffic light. The demand is calculated
-        as the amount of cars that are in the 10 cells in front of the light"""
-        self.demand = 0
-        self.car_waiting = False
-        for i in range(0, 10):
-            if self.direction == 'east':
-                if self.car_present(self.pos[0] - i, self.pos[1]):
-                    self.update_variables(i)
-            if self.direction == 'west':
-                if self.car_present(self.pos[0] + i, self.pos[1]):
-                    self.update_variables(i)
-            if self.direction == 'south':
-                if self.car_present(self.pos[0], self.pos[1] + i):
-                    self.update_variables(i)
-            if self.direction == 'north':
-                if self.car_present(self.pos[0], self.pos[1] - i):
-                    self.update_variables(i)
+        as the amount of cars that are in the 10 cells in front of the light.
+
+        Only cars travelling in the direction of the light can be in front of
+        it, so the cells are not checked if there are no such cars.
+
+        With numba the cells are counted by the compiled compute_demand(),
+        otherwise by numpy over the lookahead slice of the light."""
+        if not self.model.cars_by_dir[self.direction]:
+            self.demand = 0
+            self.car_waiting = False
+            return
+        occupancy = self.model.car_occupancy
+        if numba is not None:
+            dx, dy = OFFSETS[self.direction]
+            self.demand = compute_demand(
+                occupancy, self.pos[0], self.pos[1], dx, dy)
+        else:
+            self.demand = int(np.count_nonzero(occupancy[self.lookahead]))
+        self.car_waiting = self.car_present(*self.pos)
+        if self.car_waiting:
+            self.waiting_time += 1
 
     def car_present(self, x, y):
-        """Return whether there is a car
-        at the location of the traffic light"""
-        cell = list(self.model.grid.iter_cell_list_contents((x, y)))
-        for agent in cell:
-            if (agent.type == 'car'):
-                return True
-        return False
-
-    def update_variables(self, i):
-        """Update some of the variables from traffic light,
-        is used in calculate demand"""
-        self.demand += 1
-        if i == 0:
-            self.car_waiting = True
-            self.waiting_time += 1
+        """Return whether there is a car at position (x, y)"""
+        return bool(self.model.car_occupancy[x, y])
 
     def set_color(self, color):
         """Set the color od the light, either green or red."""
@@ -182,8 +206,7 @@ class Traffic_light(Agent):
         if self.model.system == 'Fixed time':
             self.fixed_timer()
         if self.model.system == 'Flow based':
-            times = self.model.calculate_timer()
-            self.flow_based_timer(times)
+            self.flow_based_timer()
         if self.model.system == 'Demand based':
             self.calculate_demand()
             self.demand_based_timer()